@@ -1,65 +1,399 @@
 import numpy as np
-from functools import reduce, lru_cache
+from functools import reduce, lru_cache, wraps
 from itertools import chain
+from scipy.linalg import blas
 
+from ..cache import LRUCacheByIdentity
 
-@lru_cache(maxsize=128)
+
+# Exhaustive path search is only affordable for a small number of operands,
+# beyond that we fall back to the greedy algorithm.
+_OPTIMAL_PATH_MAX_OPERANDS = 6
+
+
+@lru_cache(maxsize=256)
+def _einsum_path(shapes, indices, out_indices):
+    operands = [np.broadcast_to(0., shape) for shape in shapes]
+    args = list(chain(*zip(operands, [list(idx) for idx in indices])))
+    if out_indices is not None:
+        args.append(list(out_indices))
+    optimize = ('optimal' if len(operands) <= _OPTIMAL_PATH_MAX_OPERANDS
+                else 'greedy')
+    path, _ = np.einsum_path(*args, optimize=optimize)
+    return path
+
+
+def _einsum(*args):
+    """Same as :func:`numpy.einsum` in the interleaved (integer indices)
+    form, but the contraction path is computed only once for each
+    combination of operand shapes and indices and reused afterwards.
+    """
+    if len(args) % 2 == 0:
+        operand_args, out_indices = args, None
+    else:
+        operand_args, out_indices = args[:-1], tuple(args[-1])
+    path = _einsum_path(tuple(op.shape for op in operand_args[0::2]),
+                        tuple(tuple(idx) for idx in operand_args[1::2]),
+                        out_indices)
+    return np.einsum(*args, optimize=path)
+
+
+def _matmul_dagger(a, b):
+    """Compute :math:`A B^\\dagger` for two C-contiguous matrices with a
+    single BLAS call, without materializing :math:`B^\\dagger`.
+
+    BLAS sees C-contiguous matrices as transposed Fortran ones, so
+    :math:`(A B^\\dagger)^T = (B^T)^\\dagger A^T` is computed using the
+    conjugate-transpose flag of GEMM, and the result is transposed back
+    (without a copy).
+    """
+    gemm = blas.get_blas_funcs('gemm', (a, b))
+    return gemm(1., b.T, a.T, trans_a=2).T
+
+
+@lru_cache(maxsize=256)
+def _unfold_permutations(axes, n_axes):
+    """Axes permutation, that brings `axes` to the front of a tensor, and its
+    inverse."""
+    forward = axes + tuple(i for i in range(n_axes) if i not in axes)
+    inverse = tuple(int(i) for i in np.argsort(forward))
+    return forward, inverse
+
+
+def apply_ptm_to_axes(data, ptm, axes):
+    """Contract input indices of a PTM with the given axes of a tensor,
+    replacing them with the output indices of the PTM.
+
+    The tensor is unfolded into a matrix with the target axes as rows, so
+    that the PTM is applied with a single matrix product.
+
+    Parameters
+    ----------
+    data : array
+        A tensor, for example a Pauli vector or another PTM.
+    ptm : array
+        PTM of shape (out_0, ..., out_{n-1}, in_0, ..., in_{n-1}).
+    axes : tuple of int
+        Axes of `data`, that correspond to the PTM inputs.
+
+    Returns
+    -------
+    array
+    """
+    n = len(axes)
+    forward, inverse = _unfold_permutations(tuple(axes), len(data.shape))
+    data = data.transpose(forward)
+    if ptm.shape[n:] != data.shape[:n]:
+        raise ValueError(
+            'PTM input shape {} does not match the dimensionality of '
+            'qubits {}: {}'.format(ptm.shape[n:], axes, data.shape[:n]))
+    dim_in = int(np.prod(ptm.shape[n:]))
+    dim_out = int(np.prod(ptm.shape[:n]))
+    out = ptm.reshape((dim_out, dim_in)) @ data.reshape((dim_in, -1))
+    return out.reshape(ptm.shape[:n] + data.shape[n:]).transpose(inverse)
+
+
+# Number of entries in caches of arrays, computed for tuples of bases
+_BASES_CACHE_SIZE = 32
+
+
+def _cached_by_bases_identity(func):
+    """Cache the results of a function of a sequence of bases, using the
+    identities of the bases as a key (see :class:`LRUCacheByIdentity`)."""
+    cache = LRUCacheByIdentity(_BASES_CACHE_SIZE)
+
+    @wraps(func)
+    def wrapper(bases):
+        key = tuple(id(b) for b in bases)
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        out = func(bases)
+        out.setflags(write=False)
+        cache.put(key, out, tuple(bases))
+        return out
+
+    wrapper.cache = cache
+    return wrapper
+
+
+def _vectors_kron(a, b):
+    """Kronecker product of two sets of basis vectors, done in one pass,
+    writing the result directly in its final (contiguous) layout."""
+    return (a[:, None, :, None, :, None] * b[None, :, None, :, None, :]) \
+        .reshape((a.shape[0] * b.shape[0], a.shape[1] * b.shape[1],
+                  a.shape[2] * b.shape[2]))
+
+
+@_cached_by_bases_identity
 def bases_kron(bases):
-    return reduce(np.kron, [b.vectors for b in bases])
+    return np.ascontiguousarray(
+        reduce(_vectors_kron, [b.vectors for b in bases]))
+
+
+@_cached_by_bases_identity
+def _bases_kron_transposed(bases):
+    return np.ascontiguousarray(bases_kron(bases).transpose((0, 2, 1)))
+
+
+# Maximal number of elements in the Kronecker product of basis vectors, for
+# which the fused form of Kraus to PTM conversion is used.
+_FUSED_KRAUS_TO_PTM_MAX_SIZE = 2 ** 20
+
+
+def _joint_trace_index(bases):
+    """Index of the (normalized) identity in the tensor product of bases, or
+    `None` if any of the bases does not contain it."""
+    indices = [b.trace_index for b in bases]
+    if any(i is None for i in indices):
+        return None
+    return int(np.ravel_multi_index(indices, [b.dim_pauli for b in bases]))
+
 
+@_cached_by_bases_identity
+def _bases_kron_traceless(bases):
+    return np.delete(bases_kron(bases), _joint_trace_index(bases), axis=0)
 
-def kraus_to_ptm(kraus, bases_in, bases_out):
+
+@_cached_by_bases_identity
+def _bases_kron_transposed_traceless(bases):
+    return np.delete(_bases_kron_transposed(bases),
+                     _joint_trace_index(bases), axis=0)
+
+
+def _kraus_to_ptm_superoperator(kraus, vectors_in, vectors_out_t):
+    """Kraus to PTM conversion via the superoperator.
+
+    The Kraus operators are first summed into a :math:`D^2 \\times D^2`
+    superoperator :math:`S = \\sum_k K_k \\otimes K_k^*`, so that the PTM is
+    a product of three matrices and no batched contraction over the basis
+    elements is needed.
+    """
+    dim = kraus.shape[1]
+    superop = (kraus[:, :, None, :, None] *
+               kraus.conj()[:, None, :, None, :]).sum(axis=0) \
+        .reshape((dim * dim, dim * dim))
+    vectors_in = vectors_in.astype(kraus.dtype, copy=False)
+    vectors_out_t = vectors_out_t.astype(kraus.dtype, copy=False)
+    return (vectors_out_t.reshape((vectors_out_t.shape[0], -1)) @ superop @
+            vectors_in.reshape((vectors_in.shape[0], -1)).T) \
+        .real.astype(np.float64)
+
+
+def _kraus_to_ptm_fused(kraus, vectors_in, vectors_out):
+    """Kraus to PTM conversion as a chain of products of each Kraus operator
+    with basis elements."""
+    vectors_in = vectors_in.astype(kraus.dtype, copy=False)
+    vectors_out = vectors_out.astype(kraus.dtype, copy=False)
+    # left[x, k] = P^(o)_x K_k, right[y, k] = conj(K_k) (P^(i)_y)^T.
+    # Basis elements are Hermitian, therefore the latter is
+    # conj(K_k P^(i)_y), and its conjugation is done by BLAS, so that
+    # neither conjugated Kraus operators nor products are stored.
+    left = np.matmul(vectors_out[:, None], kraus[None])
+    right = np.matmul(kraus[None], vectors_in[:, None])
+    return _matmul_dagger(left.reshape((left.shape[0], -1)),
+                          right.reshape((right.shape[0], -1))) \
+        .real.astype(np.float64)
+
+
+def _is_diagonal(kraus):
+    """Check, that all Kraus operators in a stack are diagonal."""
+    num_kraus, dim = kraus.shape[:2]
+    # In a flattened matrix, diagonal elements are separated by runs of `dim`
+    # off-diagonal elements.
+    off_diagonal = kraus.reshape((num_kraus, -1))[:, 1:] \
+        .reshape((num_kraus, dim - 1, dim + 1))[:, :, :dim]
+    return not np.any(off_diagonal)
+
+
+def _kraus_to_ptm_diagonal(kraus, vectors_in, vectors_out_t):
+    """Kraus to PTM conversion for diagonal Kraus operators.
+
+    Diagonal Kraus operators :math:`K_k = \\mathrm{diag}(k_k)` map density
+    matrix elements as :math:`\\rho_{ij} \\to M_{ij} \\rho_{ij}`, where
+    :math:`M = \\sum_k k_k k_k^\\dagger`. The PTM is then a single product of
+    basis elements, weighted by :math:`M`.
+    """
+    diagonals = np.diagonal(kraus, axis1=1, axis2=2)
+    weights = (diagonals[:, :, None] *
+               diagonals.conj()[:, None, :]).sum(axis=0).ravel()
+    vectors_in = vectors_in.astype(kraus.dtype, copy=False)
+    vectors_out_t = vectors_out_t.astype(kraus.dtype, copy=False)
+    return ((vectors_out_t.reshape((vectors_out_t.shape[0], -1)) * weights) @
+            vectors_in.reshape((vectors_in.shape[0], -1)).T) \
+        .real.astype(np.float64)
+
+
+def _superoperator_is_cheaper(num_kraus, dim, dim_pauli_in, dim_pauli_out):
+    """Compare the number of multiplications of the superoperator and the
+    fused forms of Kraus to PTM conversion for a :math:`D`-dimensional
+    Hilbert space."""
+    superop = (num_kraus * dim ** 4 + dim_pauli_out * dim ** 4 +
+               dim_pauli_out * dim_pauli_in * dim ** 2)
+    fused = num_kraus * dim ** 2 * (
+        (dim_pauli_in + dim_pauli_out) * dim + dim_pauli_in * dim_pauli_out)
+    return superop <= fused
+
+
+def kraus_to_ptm(kraus, bases_in, bases_out, *, dtype=np.complex128):
+    """Compute a Pauli transfer matrix of an operation, defined by a set of
+    Kraus operators.
+
+    Parameters
+    ----------
+    kraus : array
+        Kraus operators of shape :math:`(N, d^n, d^n)`.
+    bases_in : tuple of quantumsim.bases.PauliBasis
+        Input bases of the PTM.
+    bases_out : tuple of quantumsim.bases.PauliBasis
+        Output bases of the PTM.
+    dtype : numpy.dtype
+        Complex data type, in which the contraction is performed. Passing
+        `numpy.complex64` halves the memory traffic at the cost of precision.
+        The result is always returned in double precision.
+
+    Returns
+    -------
+    array
+    """
     dim = bases_in[0].dim_hilbert
     nq = len(bases_in)
     if nq != len(bases_out):
         raise ValueError("Input and output bases must contain the same number"
                          " of elements")
+    shape = tuple(b.dim_pauli for b in chain(bases_out, bases_in))
+    kraus = kraus.astype(dtype, copy=False)
+    if dim ** (4 * nq) <= _FUSED_KRAUS_TO_PTM_MAX_SIZE:
+        kraus = kraus.reshape((-1, dim ** nq, dim ** nq))
+        if _is_diagonal(kraus):
+            return _kraus_to_ptm_diagonal(
+                kraus, bases_kron(bases_in),
+                _bases_kron_transposed(bases_out)).reshape(shape)
+        trace_in = _joint_trace_index(bases_in)
+        trace_out = _joint_trace_index(bases_out)
+        # PTM of a unitary has a block structure 1 ⊕ H, if both bases contain
+        # the identity: the identity is mapped to itself and all other
+        # elements are traceless. Only the block H needs to be computed then.
+        unitary_block = (
+            kraus.shape[0] == 1 and
+            trace_in is not None and trace_out is not None and
+            np.allclose(kraus[0] @ kraus[0].conj().T,
+                        np.identity(kraus.shape[1])))
+        if unitary_block:
+            vectors_in = _bases_kron_traceless(bases_in)
+            vectors_out = _bases_kron_traceless(bases_out)
+            vectors_out_t = _bases_kron_transposed_traceless(bases_out)
+        else:
+            vectors_in = bases_kron(bases_in)
+            vectors_out = bases_kron(bases_out)
+            vectors_out_t = _bases_kron_transposed(bases_out)
+
+        # For a single subsystem everything is tiny and the superoperator
+        # form is preferred for issuing the fewest NumPy calls.
+        if nq == 1 or _superoperator_is_cheaper(
+                kraus.shape[0], dim ** nq, vectors_in.shape[0],
+                vectors_out.shape[0]):
+            ptm = _kraus_to_ptm_superoperator(kraus, vectors_in, vectors_out_t)
+        else:
+            ptm = _kraus_to_ptm_fused(kraus, vectors_in, vectors_out)
+        if not unitary_block:
+            return ptm.reshape(shape)
+
+        block = ptm
+        ptm = np.zeros((block.shape[0] + 1, block.shape[1] + 1))
+        ptm[trace_out, trace_in] = 1.
+        ptm[np.delete(np.arange(ptm.shape[0]), trace_out)[:, None],
+            np.delete(np.arange(ptm.shape[1]), trace_in)] = block
+        return ptm.reshape(shape)
+
+    # Fused basis tensors would be too large, contract them one by one
     kraus = kraus.reshape([kraus.shape[0]] + [dim] * (2 * nq))
     einsum_args = []
     for i, b in enumerate(bases_out):
-        einsum_args.append(b.vectors)
+        einsum_args.append(b.vectors.astype(dtype, copy=False))
         einsum_args.append([4 * nq + i, 2 * i, 2 * i + 1])
     einsum_args.append(kraus)
     einsum_args.append([6 * nq] + [2 * i + 1 for i in range(2 * nq)])
     for i, b in enumerate(bases_in):
-        einsum_args.append(b.vectors)
+        einsum_args.append(b.vectors.astype(dtype, copy=False))
         einsum_args.append([5 * nq + i, 2 * (i + nq) + 1, 2 * (i + nq)])
     einsum_args.append(kraus.conj())
     einsum_args.append([6 * nq] + [2 * i for i in range(2 * nq)])
     einsum_args.append([4 * nq + i for i in range(2 * nq)])
-    return np.einsum(*einsum_args, optimize=True).real
+    return _einsum(*einsum_args).real.astype(np.float64)
+
+
+@_cached_by_bases_identity
+def _basis_pair_overlap(basis_pair):
+    """Matrix of overlaps :math:`\\text{tr} \\hat{A}_x \\hat{B}_y` between the
+    elements of two bases of a single subsystem. Basis elements are
+    Hermitian, so the overlaps are real."""
+    basis_a, basis_b = basis_pair
+    # tr(A B) = sum(A * conj(B)) for a Hermitian B
+    return _matmul_dagger(basis_a.vectors_flat, basis_b.vectors_flat).real
+
+
+def _matrix_kron(a, b):
+    return (a[:, None, :, None] * b[None, :, None, :]).reshape(
+        (a.shape[0] * b.shape[0], a.shape[1] * b.shape[1]))
 
 
-def ptm_convert_basis(ptm, bi_old, bo_old, bi_new, bo_new):
+def _bases_overlap(bases_a, bases_b):
+    """Matrix of overlaps :math:`\\text{tr} \\hat{A}_x \\hat{B}_y` between the
+    elements of two tensor products of bases."""
+    return reduce(_matrix_kron, [_basis_pair_overlap((a, b))
+                                 for a, b in zip(bases_a, bases_b)])
+
+
+def ptm_convert_basis(ptm, bi_old, bo_old, bi_new, bo_new, *,
+                      dtype=np.float64):
     shape = tuple(b.dim_pauli for b in chain(bo_new, bi_new))
     d_in = np.prod([b.dim_pauli for b in bi_old])
     d_out = np.prod([b.dim_pauli for b in bo_old])
-    return np.einsum("xij, yji, yz, zkl, wlk -> xw",
-                     bases_kron(bo_new), bases_kron(bo_old),
-                     ptm.reshape((d_out, d_in)),
-                     bases_kron(bi_old), bases_kron(bi_new),
-                     optimize=True).real.reshape(shape)
+    return (_bases_overlap(bo_new, bo_old).astype(dtype, copy=False) @
+            ptm.reshape((d_out, d_in)).astype(dtype, copy=False) @
+            _bases_overlap(bi_old, bi_new).astype(dtype, copy=False)) \
+        .real.reshape(shape)
+
+
+def _bases_kron_size(bases):
+    return (np.prod([b.dim_pauli for b in bases]) *
+            np.prod([b.dim_hilbert for b in bases]) ** 2)
 
 
 def dm_to_pv(dm, bases):
     n_qubits = len(bases)
+    if _bases_kron_size(bases) <= _FUSED_KRAUS_TO_PTM_MAX_SIZE:
+        # pv_x = tr(P_x dm) is a single matrix-vector product with the
+        # fused basis tensor
+        vectors_t = _bases_kron_transposed(bases)
+        return (vectors_t.reshape((vectors_t.shape[0], -1)) @
+                dm.reshape(-1)).real.reshape(
+            tuple(b.dim_pauli for b in bases))
+
     d = bases[0].dim_hilbert
     einsum_args = [dm.reshape((d,) * (2 * n_qubits)),
                    list(range(2 * n_qubits))]
     for i, b in enumerate(bases):
         einsum_args.append(b.vectors),
         einsum_args.append([2 * n_qubits + i, i + n_qubits, i])
-    return np.einsum(*einsum_args, optimize=True).real
+    return _einsum(*einsum_args).real
 
 
 def pv_to_dm(pv, bases):
     nq = len(bases)
     dim = bases[0].dim_hilbert
+    if _bases_kron_size(bases) <= _FUSED_KRAUS_TO_PTM_MAX_SIZE:
+        vectors = bases_kron(bases)
+        return (pv.reshape(-1) @ vectors.reshape((vectors.shape[0], -1))) \
+            .reshape((dim ** nq,) * 2)
+
     einsum_args = [pv, list(range(2 * nq, 3 * nq))]
     for i, b in enumerate(bases):
         einsum_args.append(b.vectors)
         einsum_args.append([2 * nq + i, i, nq + i])
-    return np.einsum(*einsum_args, optimize=True).reshape((dim ** nq,) * 2)
+    return _einsum(*einsum_args).reshape((dim ** nq,) * 2)
 
 
 def plm_lindbladian_part(lindblad_op, bases):
@@ -103,7 +437,7 @@ def plm_lindbladian_part(lindblad_op, bases):
     for i, basis in enumerate(bases):
         einsum_args += [basis.vectors, [5*n+i, n+i, 3*n+i]]
     einsum_args.append(list(range(4*n, 6*n)))
-    out = np.einsum(*einsum_args, optimize=True)
+    out = _einsum(*einsum_args)
 
     einsum_args = [
         lindblad_op, [6*n] + list(range(2*n)),
@@ -114,7 +448,7 @@ def plm_lindbladian_part(lindblad_op, bases):
     for i, basis in enumerate(bases):
         einsum_args += [basis.vectors, [5*n+i, n+i, 3*n+i]]
     einsum_args.append(list(range(4*n, 6*n)))
-    out -= 0.5 * np.einsum(*einsum_args, optimize=True)
+    out -= 0.5 * _einsum(*einsum_args)
 
     einsum_args = [
         lindblad_op, [6*n] + list(range(2*n)),
@@ -125,7 +459,7 @@ def plm_lindbladian_part(lindblad_op, bases):
     for i, basis in enumerate(bases):
         einsum_args += [basis.vectors, [5*n+i, 3*n+i, 2*n+i]]
     einsum_args.append(list(range(4*n, 6*n)))
-    out -= 0.5 * np.einsum(*einsum_args, optimize=True)
+    out -= 0.5 * _einsum(*einsum_args)
 
     return out
 
@@ -166,7 +500,7 @@ def plm_hamiltonian_part(hamiltonian, bases):
     for i, basis in enumerate(bases):
         einsum_args += [basis.vectors, [4*n+i, n+i, 2*n+i]]
     einsum_args.append(list(range(3*n, 5*n)))
-    out = np.einsum(*einsum_args, optimize=True)
+    out = _einsum(*einsum_args)
 
     einsum_args = [hamiltonian, list(range(2*n))]
     for i, basis in enumerate(bases):
@@ -174,6 +508,6 @@ def plm_hamiltonian_part(hamiltonian, bases):
     for i, basis in enumerate(bases):
         einsum_args += [basis.vectors, [4*n+i, 2*n+i, i]]
     einsum_args.append(list(range(3*n, 5*n)))
-    out -= np.einsum(*einsum_args, optimize=True)
+    out -= _einsum(*einsum_args)
 
     return -1j * out
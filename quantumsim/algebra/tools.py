@@ -12,6 +12,16 @@ sigma = {
                    [0., -1.]], dtype=complex),
 }
 
+
+def close(a, b, atol=1e-8):
+    """Checks, that all elements of `a` and `b` differ by less than `atol`.
+
+    A single-pass replacement of :func:`numpy.allclose` for the absolute
+    tolerance regime. `a` and `b` are broadcast against each other.
+    """
+    return np.abs(np.subtract(a, b)).max() < atol
+
+
 def random_hermitian_matrix(dim: int, seed: int):
     rng = np.random.RandomState(seed)
     # noinspection PyArgumentList
@@ -7,6 +7,13 @@ from .pauli_basis import PauliBasis
 _sqrt2i = np.sqrt(0.5)
 
 
+def _shared_basis(vectors, labels):
+    """Bases from this module are cached and shared between all their users,
+    so their vectors are made read-only to catch accidental modification."""
+    vectors.setflags(write=False)
+    return PauliBasis(vectors, labels)
+
+
 @lru_cache(maxsize=64)
 def general(dim_hilbert):
     """The vector of 'Pauli matrices' in dimension n.
@@ -50,7 +57,7 @@ def general(dim_hilbert):
             vectors[num, j, i] = -1j * _sqrt2i
             labels[num] = "Y{}{}".format(i, j)
 
-    return PauliBasis(vectors, labels)
+    return _shared_basis(vectors, labels)
 
 
 @lru_cache(maxsize=64)
@@ -67,45 +74,34 @@ def gell_mann(dim_hilbert):
     .. [2] https://en.wikipedia.org/wiki/Gell-Mann_matrices
     """
 
-    def diagonal(index, zeros):
-        if index == 0:
-            diag = np.ones(dim_hilbert) / np.sqrt(dim_hilbert)
-        else:
-            diag = np.zeros(dim_hilbert)
-            diag[:index] = 1
-            diag[index] = -index
-            diag /= np.sqrt(index * (index + 1))
-
-        for i, d in enumerate(diag):
-            zeros[i, i] = d
-
-    def off_diagonal(i, j, zeros):
-        if i < j:
-            zeros[i, j] = _sqrt2i
-            zeros[j, i] = _sqrt2i
-        else:
-            zeros[i, j] = 1j * _sqrt2i
-            zeros[j, i] = -1j * _sqrt2i
+    d = dim_hilbert
+    # vectors[i, j] is the matrix γ_ij
+    vectors = np.zeros((d, d, d, d), dtype=complex)
 
-    vectors = np.zeros((dim_hilbert * dim_hilbert, dim_hilbert, dim_hilbert),
-                       dtype=complex)
-    # noinspection PyTypeChecker
-    labels = np.full(dim_hilbert * dim_hilbert, None, dtype=object)
-    counter = count()
+    # Diagonal matrices: the normalized identity, followed by the
+    # generalizations of σ_z, diag(1, ..., 1, -k, 0, ..., 0).
+    diag = np.tril(np.ones((d, d)), -1) - np.diag(np.arange(d))
+    diag[0] = 1
+    diag /= np.sqrt(np.concatenate(
+        ([d], np.arange(1, d) * np.arange(2, d + 1))))[:, None]
+    k = np.arange(d)
+    vectors[k[:, None], k[:, None], k[None, :], k[None, :]] = diag
 
-    for i in range(dim_hilbert):
-        for j in range(dim_hilbert):
-            num = next(counter)
-            labels[num] = ("γ{}{}".format(i, j))
-            if i == j:
-                diagonal(i, vectors[num])
-            else:
-                off_diagonal(i, j, vectors[num])
+    # Off-diagonal matrices: σ_x-like above and σ_y-like below the diagonal
+    i, j = np.triu_indices(d, 1)
+    vectors[i, j, i, j] = _sqrt2i
+    vectors[i, j, j, i] = _sqrt2i
+    vectors[j, i, j, i] = 1j * _sqrt2i
+    vectors[j, i, i, j] = -1j * _sqrt2i
 
-    return PauliBasis(vectors, labels)
+    vectors = vectors.reshape((d * d, d, d))
+    labels = np.array(["γ{}{}".format(i, j)
+                       for i in range(d) for j in range(d)], dtype=object)
+
+    return _shared_basis(vectors, labels)
 
 
-twolevel_0xy1 = PauliBasis(
+twolevel_0xy1 = _shared_basis(
     vectors=np.array([[[1, 0], [0, 0]],
                       _sqrt2i * np.array([[0, 1], [1, 0]]),
                       _sqrt2i * np.array([[0, -1j], [1j, 0]]),
@@ -113,7 +109,7 @@ twolevel_0xy1 = PauliBasis(
     labels=np.array(("0", "X", "Y", "1"), dtype=object)
 )
 
-twolevel_ixyz = PauliBasis(
+twolevel_ixyz = _shared_basis(
     vectors=_sqrt2i * np.array([[[1, 0], [0, 1]],
                                 [[0, 1], [1, 0]],
                                 [[0, -1j], [1j, 0]],
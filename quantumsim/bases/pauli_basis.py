@@ -24,8 +24,14 @@ class PauliBasis:
             raise ValueError(
                 "Pauli basis vectors must be square matrices, got shape {}x{}"
                     .format(vectors.shape[1], vectors.shape[2]))
+        if not np.allclose(vectors, vectors.transpose((0, 2, 1)).conj()):
+            raise ValueError("Pauli basis vectors must be Hermitian matrices")
 
         self.vectors = vectors
+        # Basis elements flattened into rows, (dim_pauli, dim_hilbert**2),
+        # so that contractions with them are plain matrix products.
+        self.vectors_flat = np.ascontiguousarray(vectors).reshape(
+            (vectors.shape[0], -1))
         self.labels = labels
         self._superbasis = superbasis
 
@@ -89,11 +95,11 @@ class PauliBasis:
         return self.subbasis(idxes)
 
     def hilbert_to_pauli_vector(self, rho):
-        return np.einsum("xab, ba -> x", self.vectors, rho, optimize=True)
+        return self.vectors_flat @ np.ascontiguousarray(rho.T).reshape(-1)
 
     def is_orthonormal(self):
-        i = np.einsum("xab, yba -> xy", self.vectors,
-                      self.vectors, optimize=True)
+        # tr(A B) = sum(A * conj(B)) for a Hermitian B
+        i = self.vectors_flat @ self.vectors_flat.conj().T
         assert np.allclose(i, np.eye(self.dim_pauli))
 
     @staticmethod
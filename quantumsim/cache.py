@@ -0,0 +1,37 @@
+from collections import OrderedDict
+
+
+class LRUCacheByIdentity:
+    """A bounded least recently used cache, keyed by identities of objects.
+
+    Hashing and comparing :class:`quantumsim.bases.PauliBasis` by value
+    requires processing all of its vectors, which is too expensive for a
+    lookup on a hot path. An entry keeps references to the objects, whose
+    ids form its key, so that the ids can not be reused by other objects
+    and produce a stale hit while the entry exists.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximal number of entries. The least recently used entry is dropped,
+        when it is exceeded.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, key):
+        value = self._entries[key][1]
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, objects):
+        """Store `value` under `key`, keeping references to `objects`, whose
+        ids are used in the `key`."""
+        self._entries[key] = (objects, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
@@ -1,8 +1,10 @@
+import weakref
 from collections import deque
 
 import numpy as np
 
 from .operation import Operation, Placeholder
+from ..algebra.algebra import apply_ptm_to_axes
 
 
 def compile_operation(op, bases_in=None, bases_out=None, *,
@@ -118,18 +120,13 @@ def try_merge_next(graph, node):
     d_node = len(node.qubits)
     d_other = len(other.qubits)
 
-    contr_indices = [other.qubits.index(qubit)
-                     for qubit in node.qubits]
-    other_out = list(range(d_other))
-    other_in = list(range(d_other, 2 * d_other))
-    node_out = list(range(2 * d_other, 2 * d_other + d_node))
-    node_in = [other_in[i] for i in contr_indices]
-    for i, j in zip(contr_indices, node_out):
-        other_in[i] = j
-
-    other_ptm = np.einsum(node.op_ptm, node_out + node_in,
-                          other.op_ptm, other_out + other_in,
-                          optimize=True)
+    # Node is applied first: its transposed PTM acts on the input axes of
+    # the other's PTM, that correspond to the node's qubits.
+    contr_axes = tuple(d_other + other.qubits.index(qubit)
+                       for qubit in node.qubits)
+    node_ptm_t = node.op_ptm.transpose(
+        tuple(range(d_node, 2 * d_node)) + tuple(range(d_node)))
+    other_ptm = apply_ptm_to_axes(other.op_ptm, node_ptm_t, contr_axes)
 
     for qubit, node_prev in node.prev.items():
         other.prev[qubit] = node_prev
@@ -163,21 +160,10 @@ def try_merge_prev(graph, node):
     if isinstance(other.op, Placeholder):
         return
 
-    d_node = len(node.qubits)
-    d_other = len(other.qubits)
-
-    contr_indices = [other.qubits.index(qubit)
-                     for qubit in node.qubits]
-    other_out = list(range(d_other))
-    other_in = list(range(d_other, 2 * d_other))
-    node_in = list(range(2 * d_other, 2 * d_other + d_node))
-    node_out = contr_indices
-    for i, j in zip(contr_indices, node_in):
-        other_out[i] = j
-
-    other_ptm = np.einsum(node.op_ptm, node_out + node_in,
-                          other.op_ptm, other_out + other_in,
-                          optimize=True)
+    # Node is applied last: its PTM acts on the output axes of the other's
+    # PTM, that correspond to the node's qubits.
+    contr_axes = tuple(other.qubits.index(qubit) for qubit in node.qubits)
+    other_ptm = apply_ptm_to_axes(other.op_ptm, node.op_ptm, contr_axes)
 
     for qubit, node_next in node.next.items():
         other.next[qubit] = node_next
@@ -229,10 +215,9 @@ class Node:
         return np.all(self.qubits[:-1] <= self.qubits[1:])
 
     def arrange(self):
-        offset = max(self.qubits) + 1
-        idx = self.qubits + [q + offset for q in self.qubits]
-        new_ptm = np.einsum(self.op.ptm(self.op.bases_in, self.op.bases_out),
-                            idx, sorted(idx))
+        order = np.argsort(self.qubits)
+        new_ptm = self.op.ptm(self.op.bases_in, self.op.bases_out).transpose(
+            tuple(order) + tuple(order + len(order)))
         self.qubits = sorted(self.qubits)
         self.op = Operation.from_ptm(
             new_ptm, self.bases_in_tuple, self.bases_out_tuple)
@@ -328,26 +313,41 @@ def optimal_bases(node, *, sv_cutoff=1e-5):
     if isinstance(node.op, Placeholder):
         return node.bases_in_tuple, node.bases_out_tuple
 
-    d_in = np.prod([b.dim_pauli for b in node.op.bases_in])
-    d_out = np.prod([b.dim_pauli for b in node.op.bases_out])
-    u, s, vh = np.linalg.svd(node.op_ptm
-                             .reshape(d_out, d_in), full_matrices=False)
+    # Nodes are revisited by the compiler queue every time their neighbours
+    # change, mostly with an unchanged operation, so the SVD is cached.
+    cache = _optimal_bases_cache.setdefault(node.op, {})
+    try:
+        return cache[sv_cutoff]
+    except KeyError:
+        pass
+    out = _optimal_bases(node.op, sv_cutoff)
+    cache[sv_cutoff] = out
+    return out
+
+
+# Optimal bases of an operation for each singular value cutoff.
+_optimal_bases_cache = weakref.WeakKeyDictionary()
+
+
+def _optimal_bases(op, sv_cutoff):
+    u, s, vh = np.linalg.svd(op.ptm(op.bases_in, op.bases_out, flat=True),
+                             full_matrices=False)
     truncate_index = np.sum(s > sv_cutoff)
 
     mask_in = np.any(
         np.abs(vh[:truncate_index]) > 1e-13, axis=0) \
-        .reshape(tuple(b.dim_pauli for b in node.op.bases_in)) \
+        .reshape(tuple(b.dim_pauli for b in op.bases_in)) \
         .nonzero()
     mask_out = np.any(
         np.abs(u[:, :truncate_index]) > 1e-13, axis=1) \
-        .reshape(tuple(b.dim_pauli for b in node.op.bases_out)) \
+        .reshape(tuple(b.dim_pauli for b in op.bases_out)) \
         .nonzero()
 
     opt_bases_in = []
     opt_bases_out = []
     for opt_bases, bases, mask in (
-            (opt_bases_in, node.op.bases_in, mask_in),
-            (opt_bases_out, node.op.bases_out, mask_out)):
+            (opt_bases_in, op.bases_in, mask_in),
+            (opt_bases_out, op.bases_out, mask_out)):
         for basis, involved_indices in zip(bases, mask):
             # Figure out what single-qubit basis elements are not
             # involved at all
@@ -1,6 +1,7 @@
 import abc
 import inspect
 import re
+import weakref
 
 import numpy as np
 import scipy.linalg.matfuncs
@@ -12,6 +13,10 @@ from copy import copy
 from ..algebra.algebra import (kraus_to_ptm, ptm_convert_basis,
                                plm_lindbladian_part, plm_hamiltonian_part)
 from ..bases import PauliBasis
+from ..cache import LRUCacheByIdentity
+
+# Number of entries in per-operation caches of results for different bases
+_OPERATION_CACHE_SIZE = 8
 
 
 class OperationNotDefinedError(RuntimeError):
@@ -83,7 +88,7 @@ class Operation(metaclass=abc.ABCMeta):
             self._validate_bases(bases_out=bases_out)
 
     @abc.abstractmethod
-    def ptm(self, bases_in, bases_out=None):
+    def ptm(self, bases_in, bases_out=None, *, flat=False, dtype=None):
         """Return a full Pauli transfer matrix of the operation.
 
         Parameters
@@ -92,6 +97,17 @@ class Operation(metaclass=abc.ABCMeta):
             Input basis of the PTM
         bases_out : tuple of PauliBasis or None
             Output bases of the PTM. If None, defaults to bases_in
+        flat : bool
+            If True, return the PTM as a matrix, where all output and all
+            input indices are combined into rows and columns respectively.
+            The matrix is a view of the PTM, no copy is made.
+        dtype : numpy.dtype or None
+            Floating point type of the returned PTM. If None, double
+            precision PTM is returned. Single precision (`numpy.float32`) is
+            sufficient, if the PTM is only inspected with tolerances not
+            below :math:`10^{-6}`. Conversion to other bases is then done in
+            single precision, and the result is cached, so that repeated
+            calls do not allocate.
 
         Returns
         -------
@@ -303,6 +319,25 @@ class Operation(metaclass=abc.ABCMeta):
 
         return _Chain(operations)
 
+    def then(self, other):
+        """Returns an operation, that applies this operation and then
+        `other` to the same qubits.
+
+        Parameters
+        ----------
+        other: Operation
+            Operation to apply after this one. Must act on the same number
+            of qubits with the same Hilbert dimensionality.
+
+        Returns
+        -------
+        quantumsim.Operation
+            Resulting operation. For two PTM operations the PTMs are
+            multiplied immediately, so that the result is applied to a
+            state at the cost of a single operation.
+        """
+        return Operation.from_sequence(self, other)
+
     @property
     def _compile(self):
         # Need to lazily import due to circular dependency
@@ -332,11 +367,27 @@ class Operation(metaclass=abc.ABCMeta):
         -------
         quantumsim.Operation
         """
+        # Operations are immutable, so the result is cached on the operation
+        # for the given bases. The cache is owned by a single operation:
+        # a shallow copy of it must not reuse the entries.
+        owner, cache = getattr(self, '_compile_cache', (None, None))
+        if owner is None or owner() is not self:
+            cache = LRUCacheByIdentity(_OPERATION_CACHE_SIZE)
+            self._compile_cache = (weakref.ref(self), cache)
+        key = tuple(None if bases is None else tuple(id(b) for b in bases)
+                    for bases in (bases_in, bases_out))
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+
         if isinstance(self, _Chain):
             op = self
         else:
             op = Operation.from_sequence(self)
-        return self._compile(op, bases_in, bases_out, optimize=True)
+        compiled = self._compile(op, bases_in, bases_out, optimize=True)
+        cache.put(key, compiled, (bases_in, bases_out))
+        return compiled
 
     def at(self, *indices):
         """Returns a container with the operation, that provides also dumb
@@ -435,7 +486,7 @@ class Placeholder(Operation):
         new_op._bases_out = b_out
         return new_op
 
-    def ptm(self, bases_in, bases_out=None):
+    def ptm(self, bases_in, bases_out=None, *, flat=False, dtype=None):
         raise OperationNotDefinedError(
             'Operation placeholder does not have a PTM')
 
@@ -467,7 +518,22 @@ class PTMOperation(Operation):
        arXiv:1509.02921 (2000).
     """
     def __init__(self, ptm, bases_in, bases_out):
+        if isinstance(ptm, np.ndarray):
+            if np.iscomplexobj(ptm):
+                if not np.allclose(ptm.imag, 0):
+                    raise ValueError('PTM must be real-valued')
+                ptm = ptm.real
+            # PTMs are stored as private contiguous double precision arrays,
+            # so that they can be applied without further conversion.
+            # Operations are immutable, that allows backends to cache PTMs by
+            # identity.
+            ptm = np.array(ptm, dtype=np.float64, order='C', copy=True)
+            ptm.setflags(write=False)
         self._ptm = ptm
+        # Versions of this operation in other bases, keyed by ids of bases.
+        self._set_bases_cache = LRUCacheByIdentity(_OPERATION_CACHE_SIZE)
+        # PTMs in other floating point types, keyed by ids of bases and type
+        self._ptm_dtype_cache = LRUCacheByIdentity(_OPERATION_CACHE_SIZE)
         self.bases_in = bases_in
         self.bases_out = bases_out
         self._dim_hilbert = bases_in[0].dim_hilbert
@@ -511,20 +577,66 @@ class PTMOperation(Operation):
         b_in = bases_in or self.bases_in
         b_out = bases_out or self.bases_out
         if b_in == self.bases_in and b_out == self.bases_out:
-            new_op = self
-        else:
-            new_ptm = ptm_convert_basis(self._ptm,
-                                        self.bases_in, self.bases_out,
-                                        b_in, b_out)
-            new_op = PTMOperation(new_ptm, b_in, b_out)
+            return self
+        key = (tuple(id(b) for b in b_in), tuple(id(b) for b in b_out))
+        try:
+            return self._set_bases_cache[key]
+        except KeyError:
+            pass
+        new_ptm = ptm_convert_basis(self._ptm,
+                                    self.bases_in, self.bases_out,
+                                    b_in, b_out)
+        new_op = PTMOperation(new_ptm, b_in, b_out)
+        self._set_bases_cache.put(key, new_op, (b_in, b_out))
         return new_op
 
-    def ptm(self, bases_in, bases_out=None):
+    def ptm(self, bases_in, bases_out=None, *, flat=False, dtype=None):
         bases_out = bases_out or bases_in
+        if dtype is not None and np.dtype(dtype) != self._ptm.dtype:
+            ptm = self._ptm_in_dtype(bases_in, bases_out, np.dtype(dtype))
+        elif bases_in == self.bases_in and bases_out == self.bases_out:
+            ptm = self._ptm
+        else:
+            ptm = self.set_bases(bases_in, bases_out)._ptm
+        if flat:
+            # PTM is stored contiguously, reshape does not copy
+            return ptm.reshape((-1, np.prod(ptm.shape[self._num_qubits:])))
+        return ptm
+
+    def _ptm_in_dtype(self, bases_in, bases_out, dtype):
+        key = (tuple(id(b) for b in bases_in),
+               tuple(id(b) for b in bases_out), dtype.str)
+        try:
+            return self._ptm_dtype_cache[key]
+        except KeyError:
+            pass
         if bases_in == self.bases_in and bases_out == self.bases_out:
-            return self._ptm
+            ptm = self._ptm.astype(dtype)
         else:
-            return self.set_bases(bases_in, bases_out)._ptm
+            ptm = ptm_convert_basis(self._ptm, self.bases_in, self.bases_out,
+                                    bases_in, bases_out, dtype=dtype)
+            ptm = np.ascontiguousarray(ptm)
+        ptm.setflags(write=False)
+        self._ptm_dtype_cache.put(key, ptm, (bases_in, bases_out))
+        return ptm
+
+    def then(self, other):
+        if not isinstance(other, PTMOperation):
+            return super().then(other)
+        if self.dim_hilbert != other.dim_hilbert:
+            raise ValueError(
+                "Hilbert dimensionality of operations does not match: "
+                "{} and {}".format(self.dim_hilbert, other.dim_hilbert))
+        if self.num_qubits != other.num_qubits:
+            raise ValueError(
+                "Number of qubits in operations does not match: {} and {}"
+                .format(self.num_qubits, other.num_qubits))
+        ptm = np.dot(other.ptm(self.bases_out, other.bases_out, flat=True),
+                     self.ptm(self.bases_in, self.bases_out, flat=True))
+        shape = tuple(b.dim_pauli for b in
+                      chain_(other.bases_out, self.bases_in))
+        return PTMOperation(ptm.reshape(shape), self.bases_in,
+                            other.bases_out)
 
     def __call__(self, pauli_vector, *qubit_indices):
         """
@@ -607,7 +719,7 @@ class _Chain(Operation):
         super().set_bases(bases_in, bases_out)
         return self._compile(self, bases_in, bases_out, optimize=False)
 
-    def ptm(self, bases_in, bases_out=None):
+    def ptm(self, bases_in, bases_out=None, *, flat=False, dtype=None):
         if np.any([isinstance(x.operation, Placeholder)
                    for x in self._units]):
             raise OperationNotDefinedError('Chain contains placeholders')
@@ -620,7 +732,7 @@ class _Chain(Operation):
             .reshape(ptm_in_shape*2), bases_in)
         return self._compile(
             Operation.from_sequence(start_ptm, self), bases_in, bases_out,
-            optimize=True).ptm(bases_in, bases_out)
+            optimize=True).ptm(bases_in, bases_out, flat=flat, dtype=dtype)
 
 
 class ParametrizedOperation(Placeholder):
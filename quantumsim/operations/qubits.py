@@ -2,11 +2,46 @@ import numpy as np
 from .. import bases
 from .operation import Operation
 
-_PAULI = dict(zip(['I', 'X', 'Y', 'Z'], bases.gell_mann(2).vectors))
+_PAULI_VECTORS = bases.gell_mann(2).vectors
+_PAULI_INDEX = {label: i for i, label in enumerate('IXYZ')}
 
 bases1_default = (bases.general(2),)
 bases2_default = bases1_default * 2
 
+# Change of basis from the normalized Pauli basis (I, X, Y, Z) to the
+# default basis.
+_PAULI_TO_DEFAULT = np.einsum(
+    'xab, yba -> xy', bases1_default[0].vectors, bases.gell_mann(2).vectors,
+    optimize=True).real
+
+
+def _bloch_rotation_ptm(rotation):
+    """PTM in the default basis of a unitary operation, that rotates the
+    Bloch sphere according to the 3x3 orthogonal matrix `rotation`.
+
+    Every unitary PTM in the Pauli basis has a block form
+    :math:`1 \\oplus R`, so it can be constructed directly, avoiding a
+    generic Kraus operators to PTM conversion.
+    """
+    ptm = np.identity(4)
+    ptm[1:, 1:] = rotation
+    return _PAULI_TO_DEFAULT @ ptm @ _PAULI_TO_DEFAULT.T
+
+
+def _rx(angle):
+    sin, cos = np.sin(angle), np.cos(angle)
+    return np.array([[1, 0, 0], [0, cos, -sin], [0, sin, cos]])
+
+
+def _ry(angle):
+    sin, cos = np.sin(angle), np.cos(angle)
+    return np.array([[cos, 0, sin], [0, 1, 0], [-sin, 0, cos]])
+
+
+def _rz(angle):
+    sin, cos = np.sin(angle), np.cos(angle)
+    return np.array([[cos, -sin, 0], [sin, cos, 0], [0, 0, 1]])
+
 
 def rotate_euler(phi, theta, lamda):
     """A perfect single qubit rotation described by three Euler angles.
@@ -27,12 +62,8 @@ def rotate_euler(phi, theta, lamda):
     Operation
         An operation, that corresponds to the rotation.
     """
-    exp_phi, exp_lambda = np.exp(1j * phi), np.exp(1j * lamda)
-    sin_theta, cos_theta = np.sin(theta / 2), np.cos(theta / 2)
-    matrix = np.array([
-        [cos_theta, -1j * exp_lambda * sin_theta],
-        [-1j * exp_phi * sin_theta, exp_phi * exp_lambda * cos_theta]])
-    return Operation.from_kraus(matrix, bases1_default)
+    ptm = _bloch_rotation_ptm(_rz(phi) @ _rx(theta) @ _rz(lamda))
+    return Operation.from_ptm(ptm, bases1_default)
 
 
 def rotate_x(angle=np.pi):
@@ -45,12 +76,11 @@ def rotate_x(angle=np.pi):
 
     Returns
     -------
-    Operation.from_kraus
+    Operation
         An operation, that corresponds to the rotation.
     """
-    sin, cos = np.sin(angle / 2), np.cos(angle / 2)
-    matrix = np.array([[cos, -1j*sin], [-1j*sin, cos]])
-    return Operation.from_kraus(matrix, bases1_default)
+    return Operation.from_ptm(_bloch_rotation_ptm(_rx(angle)),
+                              bases1_default)
 
 
 def rotate_y(angle=np.pi):
@@ -63,12 +93,11 @@ def rotate_y(angle=np.pi):
 
     Returns
     -------
-    Operation.from_kraus
+    Operation
         An operation, that corresponds to the rotation.
     """
-    sin, cos = np.sin(angle / 2), np.cos(angle / 2)
-    matrix = np.array([[cos, -sin], [sin, cos]])
-    return Operation.from_kraus(matrix, bases1_default)
+    return Operation.from_ptm(_bloch_rotation_ptm(_ry(angle)),
+                              bases1_default)
 
 
 def rotate_z(angle=np.pi):
@@ -81,12 +110,11 @@ def rotate_z(angle=np.pi):
 
     Returns
     -------
-    Operation.from_kraus
+    Operation
         An operation, that corresponds to the rotation.
     """
-    exp = np.exp(-1j * angle / 2)
-    matrix = np.diag([exp, exp.conj()])
-    return Operation.from_kraus(matrix, bases1_default)
+    return Operation.from_ptm(_bloch_rotation_ptm(_rz(angle)),
+                              bases1_default)
 
 
 def phase_shift(angle):
@@ -156,11 +184,14 @@ def controlled_unitary(unitary):
     dim_hilbert = unitary.shape[0]
     if unitary.shape != (dim_hilbert, dim_hilbert):
         raise ValueError("Unitary matrix must be square")
-    control_block = np.eye(2)
-    off_diag_block_0 = np.zeros((2, dim_hilbert))
-    off_diag_block_1 = np.zeros((dim_hilbert, 2))
-    matrix = np.array([[control_block, off_diag_block_0],
-                       [off_diag_block_1, unitary]])
+    if dim_hilbert != bases2_default[1].dim_hilbert:
+        raise ValueError(
+            "Unitary matrix must act on a qubit, got a {0}x{0} matrix"
+            .format(dim_hilbert))
+    dim = 2 + dim_hilbert
+    matrix = np.zeros((dim, dim), dtype=np.result_type(unitary, float))
+    matrix[:2, :2] = np.identity(2)
+    matrix[2:, 2:] = unitary
     return Operation.from_kraus(matrix, bases2_default)
 
 
@@ -220,30 +251,31 @@ def amp_phase_damping(damp_rate, deph_rate):
     return Operation.from_sequence(amp_damp.at(0), phase_damp.at(0))
 
 
+def _pauli_kraus(weights, labels):
+    """Kraus operators :math:`\\sqrt{w_i} \\hat{P}_i` of a Pauli channel,
+    built with a single broadcast multiplication. Pauli matrices are given
+    by their labels, for example 'IX'."""
+    return (np.sqrt(np.asarray(weights, dtype=float))[:, None, None] *
+            _PAULI_VECTORS[[_PAULI_INDEX[label] for label in labels]])
+
+
 def bit_flipping(flip_rate):
-    matrix = np.array([np.sqrt(flip_rate) * _PAULI["I"],
-                       np.sqrt(1 - flip_rate) * _PAULI["X"]])
+    matrix = _pauli_kraus([flip_rate, 1 - flip_rate], 'IX')
     return Operation.from_kraus(matrix, bases1_default)
 
 
 def phase_flipping(flip_rate):
     # This is actually equivalent to the phase damping
-    matrix = np.array([np.sqrt(flip_rate) * _PAULI["I"],
-                       np.sqrt(1 - flip_rate) * _PAULI["Z"]])
+    matrix = _pauli_kraus([flip_rate, 1 - flip_rate], 'IZ')
     return Operation.from_kraus(matrix, bases1_default)
 
 
 def bit_phase_flipping(flip_rate):
-    matrix = np.array([np.sqrt(flip_rate) * _PAULI["I"],
-                       np.sqrt(1 - flip_rate) * _PAULI["Y"]])
+    matrix = _pauli_kraus([flip_rate, 1 - flip_rate], 'IY')
     return Operation.from_kraus(matrix, bases1_default)
 
 
 def depolarization(rate):
     rate = rate / 2
-    sqrt = np.sqrt(rate)
-    matrix = np.array([np.sqrt(2 - (3 * rate)) * _PAULI["I"],
-                       sqrt * _PAULI["X"],
-                       sqrt * _PAULI["Y"],
-                       sqrt * _PAULI["Z"]])
+    matrix = _pauli_kraus([2 - (3 * rate), rate, rate, rate], 'IXYZ')
     return Operation.from_kraus(matrix, bases1_default)
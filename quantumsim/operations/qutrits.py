@@ -2,6 +2,7 @@ import numpy as np
 from scipy.linalg import expm
 from .. import bases
 from .operation import Operation
+from ..algebra import kraus_to_ptm
 from ..algebra.tools import verify_kraus_unitarity
 
 _PAULI = dict(zip(['I', 'X', 'Y', 'Z'], bases.gell_mann(2).vectors))
@@ -9,6 +10,37 @@ _PAULI = dict(zip(['I', 'X', 'Y', 'Z'], bases.gell_mann(2).vectors))
 bases1_default = (bases.general(3),)
 bases2_default = bases1_default * 2
 
+_QUBIT_BASES = (bases.general(2),)
+_DEFAULT_INDEX = {label: i for i, label in enumerate(bases1_default[0].labels)}
+# Positions of the qubit basis elements in the default qutrit basis, in the
+# order of the qubit basis
+_QUBIT_INDICES = [_DEFAULT_INDEX[label] for label in _QUBIT_BASES[0].labels]
+_COHERENCE_INDICES = [(_DEFAULT_INDEX['X2' + str(i)],
+                       _DEFAULT_INDEX['Y2' + str(i)]) for i in range(2)]
+
+
+def _qubit_subspace_unitary(matrix):
+    """An operation, that applies a unitary `matrix` to the qubit subspace
+    and leaves the state :math:`|2\\rangle` intact.
+
+    The PTM of such operation in the default basis is constructed directly:
+    the qubit block is a PTM of `matrix` in the qubit basis, the populations
+    of :math:`|2\\rangle` stay intact and the coherences :math:`\\rho_{i2}`
+    are multiplied by `matrix` as a vector.
+    """
+    ptm = np.zeros((9, 9))
+    ptm[np.ix_(_QUBIT_INDICES, _QUBIT_INDICES)] = kraus_to_ptm(
+        matrix[None], _QUBIT_BASES, _QUBIT_BASES)
+    ptm[_DEFAULT_INDEX['2'], _DEFAULT_INDEX['2']] = 1.
+    # In terms of X and Y components coherences transform as
+    # (x, y) -> (Re u * x + Im u * y, -Im u * x + Re u * y)
+    for i, (x_out, y_out) in enumerate(_COHERENCE_INDICES):
+        for j, (x_in, y_in) in enumerate(_COHERENCE_INDICES):
+            ptm[x_out, x_in] = ptm[y_out, y_in] = matrix[i, j].real
+            ptm[x_out, y_in] = matrix[i, j].imag
+            ptm[y_out, x_in] = -matrix[i, j].imag
+    return Operation.from_ptm(ptm, bases1_default)
+
 
 def rotate_euler(phi, theta, lamda):
     """A perfect single qubit rotation described by three Euler angles.
@@ -32,10 +64,9 @@ def rotate_euler(phi, theta, lamda):
     exp_phi, exp_lambda = np.exp(1j * phi), np.exp(1j * lamda)
     sin_theta, cos_theta = np.sin(theta / 2), np.cos(theta / 2)
     matrix = np.array([
-        [cos_theta, -1j * exp_lambda * sin_theta, 0],
-        [-1j * exp_phi * sin_theta, exp_phi * exp_lambda * cos_theta, 0],
-        [0, 0, 1]])
-    return Operation.from_kraus(matrix, bases1_default)
+        [cos_theta, -1j * exp_lambda * sin_theta],
+        [-1j * exp_phi * sin_theta, exp_phi * exp_lambda * cos_theta]])
+    return _qubit_subspace_unitary(matrix)
 
 
 def rotate_x(angle=np.pi):
@@ -52,8 +83,8 @@ def rotate_x(angle=np.pi):
         An operation, that corresponds to the rotation.
     """
     sin, cos = np.sin(angle / 2), np.cos(angle / 2)
-    matrix = np.array([[cos, -1j * sin, 0], [-1j * sin, cos, 0], [0, 0, 1]])
-    return Operation.from_kraus(matrix, bases1_default)
+    matrix = np.array([[cos, -1j * sin], [-1j * sin, cos]])
+    return _qubit_subspace_unitary(matrix)
 
 
 def rotate_y(angle=np.pi):
@@ -70,8 +101,8 @@ def rotate_y(angle=np.pi):
         An operation, that corresponds to the rotation.
     """
     sin, cos = np.sin(angle / 2), np.cos(angle / 2)
-    matrix = np.array([[cos, -sin, 0], [sin, cos, 0], [0, 0, 1]])
-    return Operation.from_kraus(matrix, bases1_default)
+    matrix = np.array([[cos, -sin], [sin, cos]])
+    return _qubit_subspace_unitary(matrix)
 
 
 def rotate_z(angle=np.pi):
@@ -88,13 +119,13 @@ def rotate_z(angle=np.pi):
         An operation, that corresponds to the rotation.
     """
     exp = np.exp(-1j * angle / 2)
-    matrix = np.diag([exp, exp.conj(), 1])
-    return Operation.from_kraus(matrix, bases1_default)
+    matrix = np.diag([exp, exp.conj()])
+    return _qubit_subspace_unitary(matrix)
 
 
 def phase_shift(angle=np.pi):
-    matrix = np.diag([1, np.exp(1j * angle), 1])
-    return Operation.from_kraus(matrix, bases1_default)
+    matrix = np.diag([1, np.exp(1j * angle)])
+    return _qubit_subspace_unitary(matrix)
 
 
 def hadamard():
@@ -106,8 +137,8 @@ def hadamard():
         An operation, that corresponds to the rotation.
     """
     s = np.sqrt(0.5)
-    matrix = np.array([[s, s, 0], [s, -s, 0], [0, 0, 1]])
-    return Operation.from_kraus(matrix, bases1_default)
+    matrix = np.array([[s, s], [s, -s]])
+    return _qubit_subspace_unitary(matrix)
 
 
 default_cphase_params = dict(
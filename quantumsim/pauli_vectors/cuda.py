@@ -1,23 +1,63 @@
 # This file is part of quantumsim. (https://gitlab.com/quantumsim/quantumsim)
 # (c) 2020 Brian Tarasinski, Viacheslav Ostroukh, Boris Varbanov
 # Distributed under the GNU GPLv3. See LICENSE or https://www.gnu.org/licenses/gpl.txt
+import hashlib
 import sys
 
 import numpy as np
 import os
 import pytools
 import warnings
+import weakref
 
 import pycuda.autoinit
 import pycuda.driver as drv
 import pycuda.gpuarray as ga
 import pycuda.reduction
-from pycuda.compiler import SourceModule, DEFAULT_NVCC_FLAGS
+from pycuda.compiler import compile as nvcc_compile, DEFAULT_NVCC_FLAGS
 
 from .pauli_vector import PauliVectorBase
 
 package_path = os.path.dirname(os.path.realpath(__file__))
 
+cubin_cache_dir = os.path.join(os.path.expanduser("~"), ".cache",
+                               "quantumsim")
+
+
+def _load_module(source, options):
+    """Load a CUDA module, compiling it only if no cubin for this source,
+    compiler options, driver and device is found in `cubin_cache_dir`.
+
+    Unlike PyCUDA's own compiler cache, a hit does not invoke NVCC at all,
+    which saves its start-up time on every import.
+    """
+    key = hashlib.sha256()
+    for item in (source, *options, drv.get_version(),
+                 drv.get_driver_version(),
+                 pycuda.autoinit.device.compute_capability()):
+        key.update(repr(item).encode())
+    cubin_file = os.path.join(cubin_cache_dir, key.hexdigest() + ".cubin")
+    try:
+        with open(cubin_file, "rb") as f:
+            return drv.module_from_buffer(f.read())
+    except (OSError, drv.Error):
+        pass
+
+    cubin = nvcc_compile(source, options=options)
+    try:
+        os.makedirs(cubin_cache_dir, exist_ok=True)
+        # Write to a temporary file first, so that concurrently started
+        # processes never read a partially written cubin.
+        tmp_file = "{}.{}.tmp".format(cubin_file, os.getpid())
+        with open(tmp_file, "wb") as f:
+            f.write(cubin)
+        os.replace(tmp_file, cubin_file)
+    except OSError:
+        warnings.warn("Could not write compiled CUDA kernels to {}"
+                      .format(cubin_cache_dir))
+    return drv.module_from_buffer(cubin)
+
+
 mod = None
 DEFAULT_NVCC_FLAGS.append("-Wno-deprecated-gpu-targets")
 
@@ -25,7 +65,7 @@ for kernel_file in [sys.prefix + "/pycudakernels/primitives.cu",
                     package_path + "/primitives.cu"]:
     try:
         with open(kernel_file, "r") as kernel_source_file:
-            mod = SourceModule(
+            mod = _load_module(
                 kernel_source_file.read(), options=DEFAULT_NVCC_FLAGS + [
                     "--default-stream", "per-thread", "-lineinfo"])
             break
@@ -43,6 +83,17 @@ _two_qubit_general_ptm.prepare("PPPIIIII")
 _multitake = mod.get_function("multitake")
 _multitake.prepare("PPPPPPI")
 
+# Uploads of new PTMs are issued asynchronously on a separate non-blocking
+# stream from a page-locked staging buffer, so that they overlap with kernels,
+# that are still running. Kernels are launched on their own stream, that waits
+# for an event recorded after pending uploads on the device, not on the host.
+# The launch stream is a blocking one, so kernels remain ordered with respect
+# to GPUArray operations on the legacy default stream.
+_CU_STREAM_NON_BLOCKING = 0x1
+_upload_stream = drv.Stream(flags=_CU_STREAM_NON_BLOCKING)
+_upload_done = drv.Event(drv.event_flags.DISABLE_TIMING)
+_launch_stream = drv.Stream()
+
 sum_along_axis = pycuda.reduction.ReductionKernel(
     dtype_out=np.float64,
     neutral="0", reduce_expr="a+b",
@@ -54,6 +105,9 @@ sum_along_axis = pycuda.reduction.ReductionKernel(
 
 class PauliVectorCuda(PauliVectorBase):
     _gpuarray_cache = {}
+    _gpuarray_id_cache = {}
+    _staging_buffer = None
+    _uploads_pending = False
 
     def __init__(self, bases, pv=None, *, force=False):
         """Create a new density matrix for several qudits.
@@ -76,28 +130,26 @@ class PauliVectorCuda(PauliVectorBase):
                     'shape of `data` array.\n'
                     ' - bases shapes: {}\n - data shape: {}'
                     .format(self.dim_pauli, pv.shape))
-        else:
-            pv = np.zeros(self.dim_pauli, np.float64)
+
+        if pv is None:
+            # Zero the state on the device and write the single non-zero
+            # element, instead of uploading a mostly zero host array.
+            self._data = ga.zeros(self.dim_pauli, dtype=np.float64)
             ground_state_index = [pb.computational_basis_indices[0]
                                   for pb in self.bases]
-            pv[tuple(ground_state_index)] = 1
-
-        if isinstance(pv, np.ndarray):
+            offset = np.ravel_multi_index(ground_state_index, self.dim_pauli)
+            drv.memcpy_htod(int(self._data.gpudata) + 8 * int(offset),
+                            np.ones(1, dtype=np.float64))
+        elif isinstance(pv, np.ndarray):
             if pv.dtype not in (np.float16, np.float32, np.float64):
                 raise ValueError(
                     '`pv` must have float64 data type, got {}'
                     .format(pv.dtype)
                 )
 
-            # Looks like there are some issues with ordering, so the line
-            # below per se does not work.
-            # self._data = ga.to_gpu(pv.astype(np.float64))
-
-            self._work_data = ga.to_gpu(
-                pv.reshape(pv.size, order='C').astype(np.float64))
-            self._data = ga.empty(pv.shape, dtype=np.float64, order='C')
-            self._data.set(self._work_data.reshape(pv.shape))
-            self._work_data.gpudata.free()
+            # `ga.to_gpu` copies the raw buffer, so the host array must be
+            # C-contiguous; then a single host to device transfer suffices.
+            self._data = ga.to_gpu(np.ascontiguousarray(pv, dtype=np.float64))
         elif isinstance(pv, ga.GPUArray):
             if pv.dtype != np.float64:
                 raise ValueError(
@@ -117,7 +169,19 @@ class PauliVectorCuda(PauliVectorBase):
     def to_pv(self):
         return self._data.get()
 
+    def component(self, idx):
+        if not hasattr(idx, '__iter__'):
+            idx = (idx,)
+        # Download a single element instead of the whole Pauli vector
+        offset = np.ravel_multi_index(tuple(idx), self.dim_pauli)
+        out = np.empty(1, dtype=np.float64)
+        drv.memcpy_dtoh(out, int(self._data.gpudata) + 8 * int(offset))
+        return out.item()
+
     def apply_ptm(self, ptm, *qubits):
+        if isinstance(ptm, ga.GPUArray) and ptm.dtype != np.float64:
+            raise ValueError(
+                '`ptm` must have float64 data type, got {}'.format(ptm.dtype))
         if len(qubits) == 1:
             self._apply_single_qubit_ptm(qubits[0], ptm)
         elif len(qubits) == 2:
@@ -166,16 +230,22 @@ class PauliVectorCuda(PauliVectorBase):
         if len(ptm.shape) != 4:
             raise ValueError(
                 "`ptm` must be a 4D array, got {}D".format(len(ptm.shape)))
+        self._validate_device_ptm(ptm)
 
         # bit0 must be the more significant bit (bit 0 is msb)
         if qubit0 > qubit1:
             qubit0, qubit1 = qubit1, qubit0
+            if isinstance(ptm, ga.GPUArray):
+                ptm = ptm.get()
             ptm = np.einsum("abcd -> badc", ptm)
 
         new_shape = list(self._data.shape)
         dim0_out, dim1_out, dim0_in, dim1_in = ptm.shape
-        assert new_shape[qubit1] == dim1_in
-        assert new_shape[qubit0] == dim0_in
+        if (new_shape[qubit0], new_shape[qubit1]) != (dim0_in, dim1_in):
+            raise ValueError(
+                'PTM input shape {} does not match the dimensionality of '
+                'qubits: {}'.format((dim0_in, dim1_in),
+                                    (new_shape[qubit0], new_shape[qubit1])))
         new_shape[qubit1] = dim1_out
         new_shape[qubit0] = dim0_out
         new_size = pytools.product(new_shape)
@@ -206,9 +276,11 @@ class PauliVectorCuda(PauliVectorBase):
         dim_y = pytools.product(self._data.shape[qubit0 + 1:qubit1])
         dim_rho = new_size  # self.data.size
 
-        _two_qubit_general_ptm.prepared_call(
+        self._wait_for_uploads()
+        _two_qubit_general_ptm.prepared_async_call(
             grid,
             block,
+            _launch_stream,
             self._data.gpudata,
             self._work_data.gpudata,
             ptm_gpu.gpudata,
@@ -241,8 +313,13 @@ class PauliVectorCuda(PauliVectorBase):
         if len(ptm.shape) != 2:
             raise ValueError(
                 "`ptm` must be a 2D array, got {}D".format(len(ptm.shape)))
+        self._validate_device_ptm(ptm)
 
         dim_bit_out, dim_bit_in = ptm.shape
+        if new_shape[qubit] != dim_bit_in:
+            raise ValueError(
+                'PTM input shape {} does not match the dimensionality of '
+                'qubit: {}'.format(dim_bit_in, new_shape[qubit]))
         new_shape[qubit] = dim_bit_out
         assert new_shape[qubit] == dim_bit_out
         new_size = pytools.product(new_shape)
@@ -262,9 +339,11 @@ class PauliVectorCuda(PauliVectorBase):
         dim_y = pytools.product(self._data.shape[:qubit])
         dim_rho = new_size  # self.data.size
 
-        _two_qubit_general_ptm.prepared_call(
+        self._wait_for_uploads()
+        _two_qubit_general_ptm.prepared_async_call(
             grid,
             block,
+            _launch_stream,
             self._data.gpudata,
             self._work_data.gpudata,
             ptm_gpu.gpudata,
@@ -328,8 +407,10 @@ class PauliVectorCuda(PauliVectorBase):
             # brain-dead case, but should be handled according to exp.
             target_array.set(self._data.get())
         else:
-            _multitake.prepared_call(
-                grid, block, self._data.gpudata, target_array.gpudata,
+            self._wait_for_uploads()
+            _multitake.prepared_async_call(
+                grid, block, _launch_stream,
+                self._data.gpudata, target_array.gpudata,
                 idx_i_gpu.gpudata, idx_j_gpu.gpudata,
                 xshape_gpu.gpudata, yshape_gpu.gpudata,
                 np.uint32(len(yshape))
@@ -345,8 +426,8 @@ class PauliVectorCuda(PauliVectorBase):
             return target_array
 
     def trace(self):
-        # TODO: there is a smarter way of doing this with pauli-dirac basis
-        return np.sum(self.diagonal())
+        # Reduce the diagonal on the device, only a scalar is copied back
+        return ga.sum(self.diagonal(get_data=False)).get().item()
 
     def partial_trace(self, *qubits):
         raise NotImplementedError("Currently this method is implemented only "
@@ -398,6 +479,13 @@ class PauliVectorCuda(PauliVectorBase):
         """Return a deep copy of this Density."""
         return self.__class__(self.bases, pv=self._data.copy())
 
+    @staticmethod
+    def _validate_device_ptm(ptm):
+        """Kernels read PTMs as dense arrays, so a PTM, that is already
+        resident on a device, must be C-contiguous."""
+        if isinstance(ptm, ga.GPUArray) and not ptm.flags.c_contiguous:
+            raise ValueError('PTM on a device must be C-contiguous')
+
     def _cached_gpuarray(self, array):
         """
         Given a numpy array,
@@ -405,20 +493,76 @@ class PauliVectorCuda(PauliVectorBase):
 
         If it is not found in the cache, upload to gpu
         and store in cache, otherwise return cached allocation.
+
+        Read-only arrays, that own their data (for example, PTMs of
+        operations), are additionally cached by their identity, so that
+        applying the same PTM repeatedly does not require hashing its
+        contents each time. Read-only views are not cached this way, since
+        their contents change together with a writable base. Such entries
+        are evicted, when the array is garbage collected.
+
+        Arrays, that are already resident on a device (for example, PTMs
+        computed on a GPU), are returned as is (see
+        :func:`_validate_device_ptm`).
         """
+        if isinstance(array, ga.GPUArray):
+            return array
 
-        array = np.ascontiguousarray(array)
-        key = hash(array.tobytes())
+        by_id = (isinstance(array, np.ndarray) and array.base is None and
+                 not array.flags.writeable)
+        if by_id:
+            try:
+                return self._gpuarray_id_cache[id(array)]
+            except KeyError:
+                pass
+
+        contiguous = np.ascontiguousarray(array)
+        key = hash(contiguous.tobytes())
         try:
             array_gpu = self._gpuarray_cache[key]
         except KeyError:
-            array_gpu = ga.to_gpu(array)
+            array_gpu = self._upload_async(contiguous)
             self._gpuarray_cache[key] = array_gpu
 
+        if by_id:
+            self._gpuarray_id_cache[id(array)] = array_gpu
+            weakref.finalize(array, self._gpuarray_id_cache.pop,
+                             id(array), None)
+
         # for testing: read_back_and_check!
 
         return array_gpu
 
+    @classmethod
+    def _upload_async(cls, array):
+        """Start an upload of a contiguous Numpy array to the GPU on the
+        upload stream. :func:`_wait_for_uploads` must be called before the
+        result is used in a kernel."""
+        # Staging buffer is reused, previous upload from it must be finished.
+        # Upload stream is non-blocking, so this does not wait for kernels.
+        _upload_done.synchronize()
+        if cls._staging_buffer is None or cls._staging_buffer.nbytes < \
+                array.nbytes:
+            cls._staging_buffer = drv.pagelocked_empty(
+                max(array.nbytes, 4096), np.uint8)
+        staging = cls._staging_buffer[:array.nbytes].view(array.dtype) \
+            .reshape(array.shape)
+        staging[...] = array
+        array_gpu = ga.empty(array.shape, array.dtype)
+        drv.memcpy_htod_async(array_gpu.gpudata, staging,
+                              stream=_upload_stream)
+        _upload_done.record(_upload_stream)
+        cls._uploads_pending = True
+        return array_gpu
+
+    @classmethod
+    def _wait_for_uploads(cls):
+        """Make the launch stream wait on the device for uploads, issued so
+        far. Host is not blocked."""
+        if cls._uploads_pending:
+            _launch_stream.wait_for_event(_upload_done)
+            cls._uploads_pending = False
+
     def _check_cache(self):
         for k, v in self._gpuarray_cache.items():
             a = v.get().tobytes()
@@ -3,6 +3,7 @@ import warnings
 import numpy as np
 import pytools
 from .pauli_vector import PauliVectorBase
+from ..algebra.algebra import apply_ptm_to_axes
 
 
 class PauliVectorNumpy(PauliVectorBase):
@@ -35,7 +36,10 @@ class PauliVectorNumpy(PauliVectorBase):
                 )
 
         if isinstance(pv, np.ndarray):
-            self._data = pv
+            # Read-only arrays (for example, results of `to_pv` of another
+            # vector) are copied, so that the state can be modified inline
+            # and does not alias another one.
+            self._data = pv if pv.flags.writeable else pv.copy()
         elif pv is None:
             self._data = np.zeros(self.dim_pauli)
             self._data[tuple([0] * self.n_qubits)] = 1
@@ -45,23 +49,41 @@ class PauliVectorNumpy(PauliVectorBase):
                 .format(type(pv)))
 
     def to_pv(self):
-        return self._data
+        # A read-only view: no copy is made, but the state can not be
+        # modified through it.
+        pv = self._data.view()
+        pv.setflags(write=False)
+        return pv
 
     def apply_ptm(self, ptm, *qubits):
         if len(ptm.shape) != 2 * len(qubits):
             raise ValueError(
                 '{}-qubit PTM must have {} dimensions, got {}'
                 .format(len(qubits), 2*len(qubits), len(ptm.shape)))
-        dm_in_idx = list(range(self.n_qubits))
-        ptm_in_idx = list(qubits)
-        ptm_out_idx = list(range(self.n_qubits, self.n_qubits + len(
-            qubits)))
-        dm_out_idx = list(dm_in_idx)
-        for i_in, i_out in zip(ptm_in_idx, ptm_out_idx):
-            dm_out_idx[i_in] = i_out
-        self._data = np.einsum(
-            self._data, dm_in_idx, ptm, ptm_out_idx + ptm_in_idx, dm_out_idx,
-            optimize=True)
+        self._data = apply_ptm_to_axes(self._data, ptm, qubits)
+
+    @classmethod
+    def apply_ptm_batched(cls, ptm, pauli_vectors, *qubits):
+        pauli_vectors = list(pauli_vectors)
+        # A vector, that occurs several times, must get the PTM applied
+        # several times, which a single batched product does not do.
+        if (len(pauli_vectors) == 0 or
+                not all(isinstance(pv, cls) for pv in pauli_vectors) or
+                len({pv._data.shape for pv in pauli_vectors}) != 1 or
+                len({id(pv) for pv in pauli_vectors}) != len(pauli_vectors)):
+            super().apply_ptm_batched(ptm, pauli_vectors, *qubits)
+            return
+        if len(ptm.shape) != 2 * len(qubits):
+            raise ValueError(
+                '{}-qubit PTM must have {} dimensions, got {}'
+                .format(len(qubits), 2*len(qubits), len(ptm.shape)))
+        # Batch index is the first axis, so that it ends up in the columns
+        # of the unfolded matrix together with the untouched qubits.
+        batch = apply_ptm_to_axes(
+            np.stack([pv._data for pv in pauli_vectors]),
+            ptm, tuple(q + 1 for q in qubits))
+        for pv, data in zip(pauli_vectors, batch):
+            pv._data = data
 
     def diagonal(self, *, get_data=True):
         no_trace_tensors = [basis.computational_basis_vectors
@@ -45,6 +45,22 @@ class PauliVectorBase(metaclass=abc.ABCMeta):
         """Get data in a form of Numpy array"""
         pass
 
+    def component(self, idx):
+        """Get a single component of the Pauli vector.
+
+        Parameters
+        ----------
+        idx : int or tuple of int
+            Indices of the basis elements for each of the qubits.
+
+        Returns
+        -------
+        float
+        """
+        if not hasattr(idx, '__iter__'):
+            idx = (idx,)
+        return float(self.to_pv()[tuple(idx)])
+
     @classmethod
     def from_dm(cls, dm, bases, *, force=False):
         if not hasattr(bases, '__iter__'):
@@ -75,6 +91,26 @@ class PauliVectorBase(metaclass=abc.ABCMeta):
     def apply_ptm(self, operation, *qubits):
         pass
 
+    @classmethod
+    def apply_ptm_batched(cls, ptm, pauli_vectors, *qubits):
+        """Apply the same Pauli transfer matrix to the same qubits of
+        several Pauli vectors (for example, Monte Carlo trajectories or
+        points of a parameter sweep).
+
+        Backends may override this to process the whole batch at once.
+
+        Parameters
+        ----------
+        ptm : array
+            Pauli transfer matrix to apply.
+        pauli_vectors : list of PauliVectorBase
+            Pauli vectors, modified inline.
+        q0, ..., qN : int
+            Indices of qubits to act on.
+        """
+        for pauli_vector in pauli_vectors:
+            pauli_vector.apply_ptm(ptm, *qubits)
+
     @abc.abstractmethod
     def diagonal(self, *, get_data=True):
         pass
@@ -5,6 +5,7 @@
 
 import pytest
 import numpy as np
+import weakref
 from pytest import approx
 
 from quantumsim import bases, Operation
@@ -119,6 +120,24 @@ class TestCompiler:
         op_cl = op.compile(bases_in=(b0, b))
         assert op_cl.shape == (1, 4, 1, 4)
 
+    def test_compile_cached(self):
+        b = bases.general(2)
+        b01 = b.computational_subbasis()
+
+        op = lib2.cnot()
+        op_cl = op.compile(bases_in=(b01, b01))
+        assert op.compile(bases_in=(b01, b01)) is op_cl
+        assert op.compile(bases_in=(b01, b)) is not op_cl
+
+        # Cache must not keep arbitrary many bases alive
+        b01_ref = weakref.ref(b01)
+        del b01, op_cl
+        for _ in range(100):
+            b01 = b.computational_subbasis()
+            op.compile(bases_in=(b01, b01))
+        del b01
+        assert b01_ref() is None
+
     @pytest.mark.parametrize('d,lib', [(2, lib2), (3, lib3)])
     def test_chain_compile_single_qubit(self, d, lib):
         b = bases.general(d)
@@ -5,6 +5,7 @@
 
 import pytest
 import numpy as np
+import weakref
 from copy import copy
 from numpy import pi
 from pytest import approx
@@ -12,7 +13,10 @@ from pytest import approx
 import quantumsim.operations.qubits as lib2
 import quantumsim.operations.qutrits as lib3
 from quantumsim import bases, Operation
-from quantumsim.algebra.tools import random_hermitian_matrix
+from quantumsim.algebra import kraus_to_ptm
+from quantumsim.algebra.algebra import bases_kron
+from quantumsim.algebra.tools import (random_hermitian_matrix,
+                                      random_unitary_matrix)
 from quantumsim.operations import ParametrizedOperation
 from quantumsim.operations.operation import OperationNotDefinedError
 from quantumsim.pauli_vectors import PauliVectorNumpy as PauliVector
@@ -46,8 +50,7 @@ class TestOperations:
 
         assert cz_ptm.shape == (4, 4, 4, 4)
         cz_ptm = cz_ptm.reshape((16, 16))
-        assert np.all(cz_ptm.round(3) <= 1)
-        assert np.all(cz_ptm.round(3) >= -1)
+        assert -1.0005 < cz_ptm.min() and cz_ptm.max() < 1.0005
         assert np.isclose(np.sum(cz_ptm[0, :]), 1)
         assert np.isclose(np.sum(cz_ptm[:, 0]), 1)
 
@@ -61,8 +64,7 @@ class TestOperations:
 
         assert cz_ptm.shape == (9, 9, 9, 9)
         cz_ptm_flat = cz_ptm.reshape((81, 81))
-        assert np.all(cz_ptm_flat.round(3) <= 1) and np.all(
-            cz_ptm.round(3) >= -1)
+        assert -1.0005 < cz_ptm_flat.min() and cz_ptm_flat.max() < 1.0005
         assert np.isclose(np.sum(cz_ptm_flat[0, :]), 1)
         assert np.isclose(np.sum(cz_ptm_flat[:, 0]), 1)
 
@@ -83,6 +85,60 @@ class TestOperations:
         with pytest.raises(ValueError):
             _ = kraus_op.set_bases(qutrit_basis*2)
 
+    def test_kraus_to_ptm_single_precision(self):
+        qutrit_basis = (bases.gell_mann(3),)
+        system_bases = qutrit_basis * 2
+        kraus = np.array([random_unitary_matrix(9, 11) * np.sqrt(0.3),
+                          random_unitary_matrix(9, 13) * np.sqrt(0.7)])
+
+        ptm_double = kraus_to_ptm(kraus, system_bases, system_bases)
+        ptm_single = kraus_to_ptm(kraus, system_bases, system_bases,
+                                  dtype=np.complex64)
+        assert ptm_single.dtype == np.float64
+        assert ptm_single.shape == ptm_double.shape
+        assert np.allclose(ptm_single, ptm_double, atol=1e-5)
+
+    def test_kraus_to_ptm_unitary_block(self):
+        # Identity is not the first element of the input basis
+        gm = bases.gell_mann(2)
+        bases_in = (gm.subbasis([1, 0, 2, 3]), gm)
+        bases_out = (gm, gm.subbasis([3, 0]))
+        unitary = random_unitary_matrix(4, 17)
+
+        ptm = kraus_to_ptm(unitary[None], bases_in, bases_out)
+        ptm_ref = Operation.from_kraus(unitary, (bases.general(2),) * 2) \
+            .ptm(bases_in, bases_out)
+        assert ptm.shape == (4, 2, 4, 4)
+        assert ptm[0, 1, 1, 0] == approx(1.)
+        assert np.allclose(ptm, ptm_ref)
+
+    def test_kraus_to_ptm_diagonal(self):
+        rng = np.random.RandomState(41)
+        gm = bases.gell_mann(3)
+        bases_in = (gm.subbasis([1, 0, 4]), gm)
+        bases_out = (bases.general(3),) * 2
+        kraus = np.array([np.diag(rng.randn(9) + 1j * rng.randn(9))
+                          for _ in range(2)])
+
+        ptm = kraus_to_ptm(kraus, bases_in, bases_out)
+        assert ptm.shape == (9, 9, 3, 9)
+        ptm_ref = np.einsum('xab,kbc,ycd,kad->xy',
+                            bases_kron(bases_out), kraus,
+                            bases_kron(bases_in), kraus.conj()).real
+        assert np.allclose(ptm.reshape(ptm_ref.shape), ptm_ref)
+
+    def test_bases_cache_bounded(self):
+        b = bases.general(2)
+        sub = b.computational_subbasis()
+        sub_ref = weakref.ref(sub)
+        kron = bases_kron((sub, b))
+        assert bases_kron((sub, b)) is kron
+        del sub, kron
+        for _ in range(2 * bases_kron.cache.maxsize):
+            bases_kron((b.computational_subbasis(), b))
+        assert len(bases_kron.cache) == bases_kron.cache.maxsize
+        assert sub_ref() is None
+
     def test_convert_ptm_basis(self):
         p_damp = 0.5
         damp_kraus_mat = np.array(
@@ -98,6 +154,40 @@ class TestOperations:
         assert op1.bases_in == op2.bases_in
         assert op1.bases_out == op2.bases_out
 
+        op3 = op1.set_bases(general_basis, general_basis)
+        assert op1.set_bases(general_basis, general_basis) is op3
+        assert op1.ptm(general_basis) is op3.ptm(general_basis)
+
+    def test_ptm_real_contiguous(self):
+        b = (bases.general(2),) * 2
+        ptm = lib2.cnot().ptm(b)
+        op = Operation.from_ptm(ptm.transpose((1, 0, 3, 2)) + 0j, b)
+        op_ptm = op.ptm(b)
+        assert op_ptm.dtype == np.float64
+        assert op_ptm.flags.c_contiguous
+        assert np.allclose(op_ptm, ptm.transpose((1, 0, 3, 2)))
+        op_ptm_flat = op.ptm(b, flat=True)
+        assert op_ptm_flat.shape == (16, 16)
+        assert np.shares_memory(op_ptm_flat, op_ptm)
+        op_ptm_single = op.ptm(b, flat=True, dtype=np.float32)
+        assert op_ptm_single.dtype == np.float32
+        assert op_ptm_single.shape == (16, 16)
+        assert np.allclose(op_ptm_single, op_ptm_flat, atol=1e-6)
+        assert np.shares_memory(op.ptm(b, dtype=np.float32), op_ptm_single)
+        b_gm = (bases.gell_mann(2),) * 2
+        op_ptm_gm = op.ptm(b_gm, dtype=np.float32)
+        assert op_ptm_gm.dtype == np.float32
+        assert np.allclose(op_ptm_gm, op.ptm(b_gm), atol=1e-6)
+
+        with pytest.raises(ValueError, match='PTM must be real-valued'):
+            Operation.from_ptm(ptm * 1j, b)
+
+        # Operation must not share the PTM with a caller
+        ptm_in = ptm.copy()
+        op = Operation.from_ptm(ptm_in, b)
+        ptm_in[...] = 0.
+        assert np.allclose(op.ptm(b), ptm)
+
     def test_chain_create(self):
         op1 = lib2.rotate_x()
         op2 = lib2.rotate_y()
@@ -171,6 +261,28 @@ class TestOperations:
         circuit(pv2, 0, 1, 2)
         assert np.all(pv1.to_pv() == pv2.to_pv())
 
+    def test_then(self):
+        b = (bases.general(3),)
+        dm = random_hermitian_matrix(3, seed=17)
+        pv1 = PauliVector.from_dm(dm, b)
+        pv2 = PauliVector.from_dm(dm, b)
+
+        op1 = lib3.rotate_x(np.pi/2)
+        op2 = lib3.rotate_y(np.pi).set_bases(bases_in=(bases.gell_mann(3),))
+        op1(pv1, 0)
+        op2(pv1, 0)
+        op = op1.then(op2)
+        assert op.bases_in == op1.bases_in
+        assert op.bases_out == op2.bases_out
+        op(pv2, 0)
+        assert np.allclose(pv1.to_pv(), pv2.to_pv())
+
+        chain = lib3.rotate_x(np.pi/2).then(Operation.from_sequence(op2))
+        assert len(list(chain.units())) == 2
+
+        with pytest.raises(ValueError, match='Number of qubits .*'):
+            lib2.rotate_x().then(lib2.cnot())
+
     def test_ptm(self):
         # Some random gate sequence
         op_indices = [(lib2.rotate_x(np.pi/2), (0,)),
@@ -4,9 +4,11 @@
 # https://www.gnu.org/licenses/gpl.txt
 
 import numpy as np
+import pytest
 
 from quantumsim import bases, PauliVector
 import quantumsim.operations.qubits as lib
+from quantumsim.algebra.tools import close
 
 
 class TestLibrary:
@@ -21,18 +23,19 @@ class TestLibrary:
 
         rotate90(dm, 1)
         rotate180(dm, 2)
-        assert np.allclose(dm.meas_prob(0), (1, 0))
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5))
-        assert np.allclose(dm.meas_prob(2), (0, 1))
+        assert close(dm.meas_prob(0), (1, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5))
+        assert close(dm.meas_prob(2), (0, 1))
+        assert close(dm.meas_prob(2)[1], 1.)
 
         rotate180(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5))
+        assert close(dm.meas_prob(1), (0.5, 0.5))
 
         rotate90(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (1, 0))
+        assert close(dm.meas_prob(1), (1, 0))
 
         rotate360(dm, 0)
-        assert np.allclose(dm.meas_prob(0), (1, 0))
+        assert close(dm.meas_prob(0), (1, 0))
 
     def test_rotate_y(self):
         qubit_basis = (bases.general(2),)
@@ -45,18 +48,18 @@ class TestLibrary:
 
         rotate90(dm, 1)
         rotate180(dm, 2)
-        assert np.allclose(dm.meas_prob(0), (1, 0))
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5))
-        assert np.allclose(dm.meas_prob(2), (0, 1))
+        assert close(dm.meas_prob(0), (1, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5))
+        assert close(dm.meas_prob(2), (0, 1))
 
         rotate180(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5))
+        assert close(dm.meas_prob(1), (0.5, 0.5))
 
         rotate90(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (1, 0))
+        assert close(dm.meas_prob(1), (1, 0))
 
         rotate360(dm, 0)
-        assert np.allclose(dm.meas_prob(0), (1, 0))
+        assert close(dm.meas_prob(0), (1, 0))
 
     def test_rotate_z(self):
         sqrt2 = np.sqrt(2)
@@ -68,9 +71,9 @@ class TestLibrary:
         rotate360 = lib.rotate_z(2*np.pi)
 
         rotate90(dm, 0)
-        assert np.allclose(dm.to_pv(), [1, 0, 0, 0])
+        assert close(dm.to_pv(), [1, 0, 0, 0])
         rotate180(dm, 0)
-        assert np.allclose(dm.to_pv(), [1, 0, 0, 0])
+        assert close(dm.to_pv(), [1, 0, 0, 0])
 
         # manually apply a Hadamard gate
         had_expansion = np.array([0.5, 0.5, sqrt2, 0])
@@ -78,20 +81,20 @@ class TestLibrary:
                                   had_expansion)
 
         rotate180(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, -sqrt2, 0])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, -sqrt2, 0])
 
         rotate90(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, 0, -sqrt2])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, 0, -sqrt2])
 
         rotate180(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, 0, sqrt2])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, 0, sqrt2])
 
         rotate360(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, 0, sqrt2])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, 0, sqrt2])
 
     def test_rotate_euler(self):
         qubit_basis = (bases.general(2),)
@@ -101,10 +104,10 @@ class TestLibrary:
         rotate90y = lib.rotate_euler(0, 0.5*np.pi, 0)
 
         rotate90x(dm, 0)
-        assert np.allclose(dm.meas_prob(0), (0.5, 0.5))
+        assert close(dm.meas_prob(0), (0.5, 0.5))
 
         rotate90y(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5))
+        assert close(dm.meas_prob(1), (0.5, 0.5))
 
     def test_hadamard(self):
         qubit_basis = (bases.general(2),)
@@ -114,11 +117,11 @@ class TestLibrary:
         hadamard = lib.hadamard()
 
         hadamard(dm, 1)
-        assert np.allclose(dm.meas_prob(0), (1, 0))
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5))
+        assert close(dm.meas_prob(0), (1, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5))
 
         hadamard(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (1, 0))
+        assert close(dm.meas_prob(1), (1, 0))
 
     def test_cnot(self):
         cnot = lib.cnot()
@@ -128,14 +131,36 @@ class TestLibrary:
 
         dm = np.diag([0.25, 0, 0.75, 0, 0, 0, 0, 0])
         s = PauliVector.from_dm(dm, qubit_bases)
-        assert np.allclose(s.meas_prob(0), (1, 0))
-        assert np.allclose(s.meas_prob(1), (0.25, 0.75))
-        assert np.allclose(s.meas_prob(2), (1, 0))
+        assert close(s.meas_prob(0), (1, 0))
+        assert close(s.meas_prob(1), (0.25, 0.75))
+        assert close(s.meas_prob(2), (1, 0))
         cnot(s, 0, 1)
-        assert np.allclose(s.meas_prob(0), (1, 0))
-        assert np.allclose(s.meas_prob(1), (0.25, 0.75))
-        assert np.allclose(s.meas_prob(2), (1, 0))
+        assert close(s.meas_prob(0), (1, 0))
+        assert close(s.meas_prob(1), (0.25, 0.75))
+        assert close(s.meas_prob(2), (1, 0))
         cnot(s, 1, 2)
-        assert np.allclose(s.meas_prob(0), (1, 0))
-        assert np.allclose(s.meas_prob(1), (0.25, 0.75))
-        assert np.allclose(s.meas_prob(2), (0.25, 0.75))
+        assert close(s.meas_prob(0), (1, 0))
+        assert close(s.meas_prob(1), (0.25, 0.75))
+        assert close(s.meas_prob(2), (0.25, 0.75))
+
+    def test_controlled_unitary(self):
+        qubit_bases = (bases.general(2),) * 2
+        controlled_x = lib.controlled_unitary(np.array([[0, 1], [1, 0]]))
+        assert close(controlled_x.ptm(qubit_bases),
+                     lib.cnot().ptm(qubit_bases))
+
+        dm = np.diag([0.25, 0, 0.75, 0])
+        s = PauliVector.from_dm(dm, qubit_bases)
+        controlled_x(s, 0, 1)
+        assert close(s.meas_prob(0), (0.25, 0.75))
+        assert close(s.meas_prob(1), (0.25, 0.75))
+
+        controlled_rx = lib.controlled_rotation(np.pi, axis='x')
+        controlled_rx(s, 0, 1)
+        assert close(s.meas_prob(0), (0.25, 0.75))
+        assert close(s.meas_prob(1), (1, 0))
+
+        with pytest.raises(ValueError, match='.* must be square'):
+            lib.controlled_unitary(np.ones((2, 3)))
+        with pytest.raises(ValueError, match='.* must act on a qubit, .*'):
+            lib.controlled_unitary(np.identity(3))
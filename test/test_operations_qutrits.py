@@ -7,6 +7,7 @@ import numpy as np
 
 from quantumsim import bases, PauliVector
 import quantumsim.operations.qutrits as lib
+from quantumsim.algebra.tools import close
 
 
 class TestLibrary:
@@ -21,18 +22,18 @@ class TestLibrary:
 
         rotate90(dm, 1)
         rotate180(dm, 2)
-        assert np.allclose(dm.meas_prob(0), (1, 0, 0))
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5, 0))
-        assert np.allclose(dm.meas_prob(2), (0, 1, 0))
+        assert close(dm.meas_prob(0), (1, 0, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5, 0))
+        assert close(dm.meas_prob(2), (0, 1, 0))
 
         rotate180(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5, 0))
 
         rotate90(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (1, 0, 0))
+        assert close(dm.meas_prob(1), (1, 0, 0))
 
         rotate360(dm, 0)
-        assert np.allclose(dm.meas_prob(0), (1, 0, 0))
+        assert close(dm.meas_prob(0), (1, 0, 0))
 
     def test_rotate_y(self):
         basis = (bases.general(3),)
@@ -45,18 +46,18 @@ class TestLibrary:
 
         rotate90(dm, 1)
         rotate180(dm, 2)
-        assert np.allclose(dm.meas_prob(0), (1, 0, 0))
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5, 0))
-        assert np.allclose(dm.meas_prob(2), (0, 1, 0))
+        assert close(dm.meas_prob(0), (1, 0, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5, 0))
+        assert close(dm.meas_prob(2), (0, 1, 0))
 
         rotate180(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5, 0))
 
         rotate90(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (1, 0, 0))
+        assert close(dm.meas_prob(1), (1, 0, 0))
 
         rotate360(dm, 0)
-        assert np.allclose(dm.meas_prob(0), (1, 0, 0))
+        assert close(dm.meas_prob(0), (1, 0, 0))
 
     def test_rotate_z(self):
         sqrt2 = np.sqrt(2)
@@ -68,29 +69,29 @@ class TestLibrary:
         rotate360 = lib.rotate_z(2*np.pi)
 
         rotate90(dm, 0)
-        assert np.allclose(dm.to_pv(), [1] + [0] * 8)
+        assert close(dm.to_pv(), [1] + [0] * 8)
         rotate180(dm, 0)
-        assert np.allclose(dm.to_pv(), [1] + [0] * 8)
+        assert close(dm.to_pv(), [1] + [0] * 8)
 
         # manually apply a Hadamard gate
         had_expansion = np.array([0.5, 0.5, 0, sqrt2, 0, 0, 0, 0, 0])
         superpos_dm = PauliVector(qubit_basis, had_expansion)
 
         rotate180(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, 0, -sqrt2, 0, 0, 0, 0, 0])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, 0, -sqrt2, 0, 0, 0, 0, 0])
 
         rotate90(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, 0, 0, -sqrt2, 0, 0, 0, 0])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, 0, 0, -sqrt2, 0, 0, 0, 0])
 
         rotate180(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, 0, 0, sqrt2, 0, 0, 0, 0])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, 0, 0, sqrt2, 0, 0, 0, 0])
 
         rotate360(superpos_dm, 0)
-        assert np.allclose(superpos_dm.to_pv(),
-                           [0.5, 0.5, 0, 0, sqrt2, 0, 0, 0, 0])
+        assert close(superpos_dm.to_pv(),
+                     [0.5, 0.5, 0, 0, sqrt2, 0, 0, 0, 0])
 
     def test_hadamard(self):
         qubit_basis = (bases.general(3),)
@@ -100,11 +101,11 @@ class TestLibrary:
         hadamard = lib.hadamard()
 
         hadamard(dm, 1)
-        assert np.allclose(dm.meas_prob(0), (1, 0, 0))
-        assert np.allclose(dm.meas_prob(1), (0.5, 0.5, 0))
+        assert close(dm.meas_prob(0), (1, 0, 0))
+        assert close(dm.meas_prob(1), (0.5, 0.5, 0))
 
         hadamard(dm, 1)
-        assert np.allclose(dm.meas_prob(1), (1, 0, 0))
+        assert close(dm.meas_prob(1), (1, 0, 0))
 
     def test_cphase_compatability(self):
         cz_op_nz = lib.cphase(angle=np.pi,
@@ -117,7 +118,7 @@ class TestLibrary:
                                   model='legacy')
 
         b = (cz_op_nz.bases_in, cz_op_nz.bases_out)
-        assert np.allclose(cz_op_nz.ptm(*b), cz_op_legacy.ptm(*b))
+        assert close(cz_op_nz.ptm(*b), cz_op_legacy.ptm(*b))
 
         input_leakage_rate = 0.001
         cz_op_nz = lib.cphase(angle=np.pi,
@@ -127,5 +128,5 @@ class TestLibrary:
         cz_op_legacy = lib.cphase(angle=np.pi,
                                   leakage_rate=4*input_leakage_rate,
                                   model='legacy')
-        assert np.allclose(
+        assert close(
             cz_op_nz.ptm(*b), cz_op_legacy.ptm(*b))
@@ -124,6 +124,20 @@ class TestPauliVectors:
         assert pv[0, 0, 2] == approx(0.5 * 2**0.5)
         assert pv[0, 0, 3] == approx(0.33 * 2**0.5)
 
+        assert s.component((0, 0, 1)) == 0.75
+        assert s.component((0, 0, 3)) == approx(0.33 * 2**0.5)
+        # State can not be modified through the result of `to_pv`
+        try:
+            pv[0, 0, 0] = 1.
+        except ValueError:
+            pass
+        assert s.to_pv()[0, 0, 0] == 0.25
+
+        s2 = pauli_vector_cls.from_pv(s.to_pv(), bases)
+        s2.apply_ptm(np.diag([0.5, 1., 1., 1.]), 2)
+        assert s2.renormalize() == approx(0.875)
+        assert s.to_pv()[0, 0, 0] == 0.25
+
     def test_create_from_random_dm(self, pauli_vector_cls, dm_basis):
         dm = random_density_matrix(8, 34)
         bases = (dm_basis(2),) * 3
@@ -236,6 +250,72 @@ class TestPauliVectors:
         pv0.apply_ptm(ptm, *qubits)
         assert pv0.to_pv() == approx(pv1.to_pv())
 
+    @pytest.mark.parametrize('qubits', [(0,), (2,), (0, 1), (2, 0)])
+    def test_apply_device_ptm(self, dm_basis, qubits):
+        ga = pytest.importorskip('pycuda.gpuarray')
+        cuda = pytest.importorskip('quantumsim.pauli_vectors.cuda')
+        b = (dm_basis(2),)
+        bases = b * 3
+        unitary = random_unitary_matrix(2 ** len(qubits), 45)
+        ptm = kraus_to_ptm(unitary.reshape((1,) + unitary.shape),
+                           b * len(qubits), b * len(qubits))
+        dm = random_density_matrix(8, seed=46)
+
+        pv = cuda.PauliVectorCuda.from_dm(dm, bases)
+        pv_ref = cuda.PauliVectorCuda.from_dm(dm, bases)
+        pv.apply_ptm(ga.to_gpu(ptm), *qubits)
+        pv_ref.apply_ptm(ptm, *qubits)
+        assert pv.to_pv() == approx(pv_ref.to_pv())
+
+        if len(qubits) == 1:
+            with pytest.raises(ValueError, match='.* must be C-contiguous'):
+                pv.apply_ptm(ga.to_gpu(ptm).T, *qubits)
+        with pytest.raises(ValueError, match='.* must have float64 .*'):
+            pv.apply_ptm(ga.to_gpu(ptm.astype(np.float32)), *qubits)
+
+    def test_apply_readonly_view_ptm(self, pauli_vector_cls, dm_basis):
+        b = (dm_basis(2),)
+        bases = b * 3
+        ptms = [kraus_to_ptm(random_unitary_matrix(2, seed)[None], b, b)
+                for seed in (45, 46)]
+        dm = random_density_matrix(8, seed=47)
+        pv = pauli_vector_cls.from_dm(dm, bases)
+        pv_ref = pauli_vector_cls.from_dm(dm, bases)
+
+        # A read-only view changes together with its base
+        base = ptms[0].copy()
+        view = base.view()
+        view.setflags(write=False)
+        for ptm in ptms:
+            base[...] = ptm
+            pv.apply_ptm(view, 1)
+            pv_ref.apply_ptm(ptm.copy(), 1)
+            assert pv.to_pv() == approx(pv_ref.to_pv())
+
+    @pytest.mark.parametrize('qubits', [(0,), (2,), (0, 1), (2, 0)])
+    def test_apply_ptm_batched(self, pauli_vector_cls, dm_basis, qubits):
+        b = (dm_basis(2),)
+        bases = b * 3
+        unitary = random_unitary_matrix(2 ** len(qubits), 45)
+        ptm = kraus_to_ptm(unitary.reshape((1,) + unitary.shape),
+                           b * len(qubits), b * len(qubits))
+
+        pvs = [pauli_vector_cls.from_dm(random_density_matrix(8, seed), bases)
+               for seed in (46, 47, 48)]
+        pvs_ref = [pv.copy() for pv in pvs]
+
+        pauli_vector_cls.apply_ptm_batched(ptm, pvs, *qubits)
+        for pv, pv_ref in zip(pvs, pvs_ref):
+            pv_ref.apply_ptm(ptm, *qubits)
+            assert pv.to_pv() == approx(pv_ref.to_pv())
+
+        # Vector, that occurs twice, gets the PTM applied twice
+        pv, pv_ref = pvs[0], pvs_ref[0]
+        pauli_vector_cls.apply_ptm_batched(ptm, [pv, pv], *qubits)
+        pv_ref.apply_ptm(ptm, *qubits)
+        pv_ref.apply_ptm(ptm, *qubits)
+        assert pv.to_pv() == approx(pv_ref.to_pv())
+
     @pytest.mark.parametrize(
         'bases', [
             (quantumsim.bases.general(2), quantumsim.bases.general(2), quantumsim.bases.general(2)),